@@ -0,0 +1,291 @@
+"""
+In-process barcode indexes for the dashboards.
+
+BarcodeNgramIndex
+  Case-insensitive "contains" search over a growing set of barcodes (cell or
+  module), so a partial barcode typed on a dashboard becomes a short list of
+  exact barcodes that SQL Server can seek on, instead of a LIKE '%x%' scan.
+
+  index = BarcodeNgramIndex(since=datetime(2025, 1, 1))
+  index.add(["PK24A00017", "PK24A00018"], watermark=datetime(2025, 1, 2, 8, 0))
+  index.search("a0001")   -> ["PK24A00017", "PK24A00018"]
+  index.search("a0", 10)  -> None (shorter than one n-gram: caller keeps the LIKE)
+
+GenealogyIndex
+  Any FG / SFG / Module01 / Module02 ID -> the Z03_SFG_FG_ID_Linkage rows it appears
+  in, so a trace can start from whichever barcode the operator scanned.
+
+  genealogy.add([{"DateTime": t, "FGNumber": "FG1", "SFGNumber": "SFG1",
+                  "Module01_ID": "M1", "Module02_ID": "M2"}], watermark=t)
+  genealogy.lookup("m1")      -> the FG1 record (latest linkage containing M1)
+  genealogy.related("m1")     -> ["FG1", "SFG1", "M1", "M2"]
+  genealogy.fg_numbers("m1")  -> ["FG1"]
+
+CellModuleIndex
+  Cell barcode -> (module, position 1..48, module Date_Time) from the 48 BarcodeNN
+  columns of Module_Formation_Report, the reverse of the CROSS APPLY unpivot.
+
+  cells.add([("MOD1", t, ["C1", "C2", None, ...])], watermark=t)
+  cells.lookup("c2")          -> {"module_id": "MOD1", "position": 2, "date_time": t}
+  cells.modules_for(["c2"])   -> ["MOD1"]
+
+Notes:
+ - Append-only: barcodes are never removed; `since` / `watermark` tell the caller
+   which Date_Time range the index has seen, and the app refreshes from the watermark
+   (and periodically replaces the index with one built from a later `since`)
+ - Postings are array('I') of ids in insertion (= ascending) order, intersected with
+   np.searchsorted, so memory is ~4 bytes per (barcode, distinct n-gram)
+ - IDs are matched case-insensitively (like the database collation); blanks and "0"
+   mean "not linked" and are not indexed
+ - GenealogyIndex keeps the latest row per FGNumber; rows without an FGNumber are skipped
+ - CellModuleIndex keeps every (module, position) a cell was seen in; lookup() is the latest
+"""
+
+from array import array
+from threading import Lock
+from typing import Iterable, List, Optional
+
+import numpy as np
+
+
+class BarcodeNgramIndex:
+    """Distinct barcodes with an n-gram -> ids posting list per lower-cased n-gram."""
+
+    def __init__(self, since=None, n: int = 3):
+        self.n = n
+        self.since = since          # oldest Date_Time covered
+        self.watermark = None       # newest Date_Time folded in
+        self.loaded = False         # True after the first full read
+        self._barcodes: List[str] = []
+        self._ids = {}              # lower-cased barcode -> id
+        self._postings = {}         # n-gram -> array("I") of ids, ascending
+        self._lock = Lock()
+
+    def __len__(self) -> int:
+        return len(self._barcodes)
+
+    def _grams(self, key: str):
+        return {key[i:i + self.n] for i in range(len(key) - self.n + 1)}
+
+    def add(self, barcodes: Iterable, watermark=None) -> int:
+        """Index new barcodes (duplicates / blanks skipped); returns how many were new."""
+        added = 0
+        with self._lock:
+            for bc in barcodes:
+                if bc is None:
+                    continue
+                bc = str(bc).strip()
+                key = bc.lower()
+                if not key or key in self._ids:
+                    continue
+                idx = len(self._barcodes)
+                self._barcodes.append(bc)
+                self._ids[key] = idx
+                for gram in self._grams(key):
+                    posting = self._postings.get(gram)
+                    if posting is None:
+                        posting = self._postings[gram] = array("I")
+                    posting.append(idx)
+                added += 1
+            if watermark is not None and (self.watermark is None or watermark > self.watermark):
+                self.watermark = watermark
+        return added
+
+    def search(self, fragment: str, limit: Optional[int] = None) -> Optional[List[str]]:
+        """
+        Barcodes containing `fragment` (case-insensitive), in insertion order.
+        None when the fragment is shorter than n or more than `limit` barcodes match.
+        """
+        frag = (fragment or "").strip().lower()
+        if len(frag) < self.n:
+            return None
+        with self._lock:
+            postings = [self._postings.get(g) for g in self._grams(frag)]
+            if any(p is None for p in postings):
+                return []
+            postings.sort(key=len)
+            ids = np.array(postings[0], dtype=np.uint32)
+            for posting in postings[1:]:
+                if ids.size == 0:
+                    break
+                # frombuffer views pin the array's buffer; keep them inside the lock
+                view = np.frombuffer(posting, dtype=np.uint32)
+                pos = np.minimum(np.searchsorted(view, ids), view.size - 1)
+                ids = ids[view[pos] == ids]
+                del view
+            # n-grams can all be present without being contiguous: confirm
+            matches = [self._barcodes[i] for i in ids.tolist() if frag in self._barcodes[i].lower()]
+        if limit is not None and len(matches) > limit:
+            return None
+        return matches
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "barcodes": len(self._barcodes),
+                "ngrams": len(self._postings),
+                "postings": sum(len(p) for p in self._postings.values()),
+                "since": self.since,
+                "watermark": self.watermark,
+            }
+
+
+LINKAGE_ID_FIELDS = ("FGNumber", "SFGNumber", "Module01_ID", "Module02_ID")
+
+
+def _linkage_key(value) -> Optional[str]:
+    if value is None:
+        return None
+    key = str(value).strip().lower()
+    return key if key not in ("", "0") else None
+
+
+class GenealogyIndex:
+    """Latest linkage record per FGNumber plus an ID -> FGNumbers map over all four ID columns."""
+
+    def __init__(self):
+        self.watermark = None       # newest linkage DateTime folded in
+        self.loaded = False         # True after the first full read
+        self._records = {}          # FG key -> record dict
+        self._fgs_by_id = {}        # any ID key -> [FG keys], first-seen order
+        self._lock = Lock()
+
+    def __len__(self) -> int:
+        return len(self._records)
+
+    def add(self, records: Iterable, watermark=None) -> int:
+        """
+        Fold in linkage rows (mappings with DateTime + LINKAGE_ID_FIELDS), in any order;
+        returns rows applied. Every row's IDs are posted under its FG; the stored record
+        is only replaced by a row at least as new.
+        """
+        applied = 0
+        with self._lock:
+            for rec in records:
+                fg_key = _linkage_key(rec["FGNumber"])
+                if fg_key is None:
+                    continue
+                for field in LINKAGE_ID_FIELDS:
+                    key = _linkage_key(rec[field])
+                    if key is None:
+                        continue
+                    fgs = self._fgs_by_id.setdefault(key, [])
+                    if fg_key not in fgs:
+                        fgs.append(fg_key)
+                applied += 1
+                current = self._records.get(fg_key)
+                if current is not None and current["DateTime"] is not None and rec["DateTime"] is not None \
+                        and rec["DateTime"] < current["DateTime"]:
+                    continue
+                record = {"DateTime": rec["DateTime"]}
+                record.update((f, rec[f]) for f in LINKAGE_ID_FIELDS)
+                self._records[fg_key] = record
+            if watermark is not None and (self.watermark is None or watermark > self.watermark):
+                self.watermark = watermark
+        return applied
+
+    def _records_for(self, barcode) -> List[dict]:
+        key = _linkage_key(barcode)
+        if key is None:
+            return []
+        out = []
+        for fg_key in self._fgs_by_id.get(key, ()):
+            record = self._records[fg_key]
+            # an FG re-linked later may no longer contain the ID
+            if any(_linkage_key(record[f]) == key for f in LINKAGE_ID_FIELDS):
+                out.append(record)
+        return out
+
+    def lookup(self, barcode) -> Optional[dict]:
+        """Latest linkage record containing `barcode` in any ID column, or None."""
+        with self._lock:
+            records = self._records_for(barcode)
+        if not records:
+            return None
+        return dict(max(records, key=lambda r: (r["DateTime"] is not None, r["DateTime"] or 0)))
+
+    def related(self, barcode) -> List[str]:
+        """Every ID linked with `barcode` (itself included), in FG, SFG, Module01, Module02 order."""
+        with self._lock:
+            records = self._records_for(barcode)
+        seen, out = set(), []
+        for field in LINKAGE_ID_FIELDS:
+            for record in records:
+                key = _linkage_key(record[field])
+                if key is not None and key not in seen:
+                    seen.add(key)
+                    out.append(str(record[field]).strip())
+        return out
+
+    def fg_numbers(self, barcode) -> List[str]:
+        """FGNumbers (as stored) of every linkage row the ID was ever seen in."""
+        key = _linkage_key(barcode)
+        if key is None:
+            return []
+        with self._lock:
+            return [str(self._records[fg]["FGNumber"]).strip() for fg in self._fgs_by_id.get(key, ())]
+
+
+class CellModuleIndex:
+    """Cell barcode -> [(module_id, position, date_time)] placements, unpivoted from module rows."""
+
+    def __init__(self, since=None):
+        self.since = since          # oldest module Date_Time covered
+        self.watermark = None       # newest module Date_Time folded in
+        self.loaded = False         # True after the first full read
+        self._by_cell = {}          # lower-cased cell barcode -> [(module_id, position, date_time)]
+        self._lock = Lock()
+
+    def __len__(self) -> int:
+        return len(self._by_cell)
+
+    def add(self, modules: Iterable, watermark=None) -> int:
+        """Fold in (module_id, date_time, cells) tuples, cells in Barcode01..48 order; returns new placements."""
+        added = 0
+        with self._lock:
+            for module_id, date_time, cells in modules:
+                if module_id is None:
+                    continue
+                module_id = str(module_id).strip()
+                for position, cell in enumerate(cells, start=1):
+                    key = _linkage_key(cell)
+                    if key is None:
+                        continue
+                    placements = self._by_cell.setdefault(key, [])
+                    for i, (mod, pos, _) in enumerate(placements):
+                        if mod == module_id and pos == position:
+                            placements[i] = (module_id, position, date_time)
+                            break
+                    else:
+                        placements.append((module_id, position, date_time))
+                        added += 1
+            if watermark is not None and (self.watermark is None or watermark > self.watermark):
+                self.watermark = watermark
+        return added
+
+    def placements(self, cell) -> List[dict]:
+        """Every module position the cell was seen in, oldest module first."""
+        key = _linkage_key(cell)
+        with self._lock:
+            found = list(self._by_cell.get(key, ())) if key is not None else []
+        found.sort(key=lambda p: (p[2] is not None, p[2] or 0))
+        return [{"module_id": m, "position": pos, "date_time": dt} for m, pos, dt in found]
+
+    def lookup(self, cell) -> Optional[dict]:
+        """The latest module position of the cell, or None."""
+        found = self.placements(cell)
+        return found[-1] if found else None
+
+    def modules_for(self, cells: Iterable) -> List[str]:
+        """Distinct modules holding any of the cells, in first-seen order."""
+        seen, out = set(), []
+        with self._lock:
+            for cell in cells:
+                key = _linkage_key(cell)
+                if key is None:
+                    continue
+                for module_id, _, _ in self._by_cell.get(key, ()):
+                    if module_id not in seen:
+                        seen.add(module_id)
+                        out.append(module_id)
+        return out
@@ -0,0 +1,177 @@
+"""
+Benchmark: GradeSuggestionEngine at production scale.
+
+Times the public entry points and the hot helpers on synthetic rejected cells
+(three voltage clusters + outliers, like the example generator in Final.py) at
+10^4 .. 10^7 cells, records the peak traced memory of each step, and writes
+everything to a JSON file. --compare flags steps that got slower than a
+previous run.
+
+Dict-based steps (suggest_ranges_equal_width, suggest_ranges_kmeans,
+_extract_voltages) need one dict per cell, so they only run up to
+--max-dict-cells; the *_arrays / _iqr_filter steps run at every size.
+
+Usage:
+  python benchmarks/bench_grade_engine.py                                  # 1e4 .. 1e7
+  python benchmarks/bench_grade_engine.py --sizes 10000 100000 --repeat 5
+  python benchmarks/bench_grade_engine.py --output before.json
+  python benchmarks/bench_grade_engine.py --output after.json --compare before.json
+"""
+
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+from datetime import datetime
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from cellsuggestion import GradeSuggestionEngine  # noqa: E402
+
+
+def synthetic_cells(n, seed=0):
+    """Voltage / IR columns: clusters at 3.2 / 4.1 / 5.6 V (29 / 48 / 23 %) + 3 outliers."""
+    rng = np.random.default_rng(seed)
+    n_a, n_b = int(n * 0.29), int(n * 0.48)
+    volts = np.concatenate([rng.normal(3.2, 0.08, n_a),
+                            rng.normal(4.1, 0.05, n_b),
+                            rng.normal(5.6, 0.07, n - n_a - n_b - 3),
+                            np.array([6.8, 7.0, 1.2])])
+    ir = rng.normal(1.85, 0.2, n)
+    return volts, ir
+
+
+def as_cells(volts, ir):
+    return [{"cell_id": f"C{i + 1:08d}", "measured_voltage": v, "measured_resistance": r}
+            for i, (v, r) in enumerate(zip(volts.tolist(), ir.tolist()))]
+
+
+def steps_for(engine, volts, ir, cells):
+    """(name, callable) per step; dict steps only when cells were built."""
+    steps = [
+        ("_iqr_filter", lambda: GradeSuggestionEngine._iqr_filter(
+            GradeSuggestionEngine._voltage_array(volts), engine.iqr_multiplier)),
+        ("suggest_ranges_equal_width_arrays", lambda: engine.suggest_ranges_equal_width_arrays(volts, ir)),
+        ("suggest_ranges_kmeans_arrays[dp]", lambda: engine.suggest_ranges_kmeans_arrays(volts, method="dp")),
+        ("suggest_ranges_kmeans_arrays[sklearn]", lambda: engine.suggest_ranges_kmeans_arrays(volts)),
+    ]
+    if cells is not None:
+        steps += [
+            ("_extract_voltages", lambda: GradeSuggestionEngine._extract_voltages(cells)),
+            ("suggest_ranges_equal_width", lambda: engine.suggest_ranges_equal_width(cells)),
+            ("suggest_ranges_kmeans[dp]", lambda: engine.suggest_ranges_kmeans(cells, method="dp")),
+            ("suggest_ranges_kmeans[sklearn]", lambda: engine.suggest_ranges_kmeans(cells)),
+        ]
+    return steps
+
+
+def run_step(fn, repeat, measure_memory):
+    """Wall times of `repeat` runs, then one run under tracemalloc for the peak."""
+    times = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - t0)
+    peak = None
+    if measure_memory:
+        tracemalloc.start()
+        fn()
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    return times, peak
+
+
+def git_revision():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], stderr=subprocess.DEVNULL,
+                                       cwd=os.path.dirname(os.path.abspath(__file__))).decode().strip()
+    except Exception:
+        return None
+
+
+def compare(results, baseline_path, threshold):
+    """Print new / old ratio per (cells, step); return the regressions above threshold."""
+    with open(baseline_path, "r", encoding="utf-8") as fh:
+        baseline = {(r["cells"], r["step"]): r for r in json.load(fh)["results"] if r.get("seconds_min")}
+    regressions = []
+    print()
+    print(f"{'cells':>10} | {'step':<40} | {'old s':>9} | {'new s':>9} | {'ratio':>6}")
+    print("-" * 87)
+    for r in results:
+        old = baseline.get((r["cells"], r["step"]))
+        if old is None or not r.get("seconds_min"):
+            continue
+        ratio = r["seconds_min"] / old["seconds_min"]
+        flag = "  <-- slower" if ratio > threshold else ""
+        print(f"{r['cells']:>10} | {r['step']:<40} | {old['seconds_min']:9.4f} | {r['seconds_min']:9.4f} | "
+              f"{ratio:5.2f}x{flag}")
+        if ratio > threshold:
+            regressions.append(r)
+    return regressions
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--sizes", type=int, nargs="+", default=[10 ** 4, 10 ** 5, 10 ** 6, 10 ** 7])
+    ap.add_argument("--repeat", type=int, default=3, help="timed runs per step (min and median are kept)")
+    ap.add_argument("--max-dict-cells", type=int, default=10 ** 6,
+                    help="largest size for the dict-based steps (one dict per cell)")
+    ap.add_argument("--no-memory", action="store_true", help="skip the tracemalloc pass")
+    ap.add_argument("--output", default="bench_grade_engine.json")
+    ap.add_argument("--compare", metavar="BASELINE_JSON", help="flag steps slower than this earlier run")
+    ap.add_argument("--threshold", type=float, default=1.25,
+                    help="new / old time ratio counted as a regression (default 1.25)")
+    args = ap.parse_args()
+
+    engine = GradeSuggestionEngine()
+    results = []
+    print(f"{'cells':>10} | {'step':<40} | {'min s':>9} | {'median s':>9} | {'peak MB':>8}")
+    print("-" * 89)
+    for n in args.sizes:
+        volts, ir = synthetic_cells(n)
+        cells = as_cells(volts, ir) if n <= args.max_dict_cells else None
+        for step, fn in steps_for(engine, volts, ir, cells):
+            entry = {"cells": n, "step": step}
+            try:
+                times, peak = run_step(fn, args.repeat, not args.no_memory)
+            except RuntimeError as e:  # e.g. scikit-learn not installed
+                entry["error"] = str(e)
+                print(f"{n:>10} | {step:<40} | {'skipped: ' + str(e)[:36]}")
+                results.append(entry)
+                continue
+            entry.update(seconds_min=min(times), seconds_median=float(np.median(times)),
+                         repeat=len(times), peak_bytes=peak)
+            peak_s = f"{peak / 2 ** 20:8.1f}" if peak is not None else f"{'-':>8}"
+            print(f"{n:>10} | {step:<40} | {min(times):9.4f} | {entry['seconds_median']:9.4f} | {peak_s}")
+            results.append(entry)
+        del cells
+
+    report = {
+        "meta": {
+            "created": datetime.now().isoformat(timespec="seconds"),
+            "git_revision": git_revision(),
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "platform": platform.platform(),
+            "repeat": args.repeat,
+        },
+        "results": results,
+    }
+    with open(args.output, "w", encoding="utf-8") as fh:
+        json.dump(report, fh, indent=2)
+    print(f"\nWrote {args.output}")
+
+    if args.compare:
+        regressions = compare(results, args.compare, args.threshold)
+        if regressions:
+            print(f"\n{len(regressions)} step(s) slower than {args.threshold}x the baseline")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+"""
+Benchmark: list-based vs vectorized IQR filter + grade bin counting.
+
+Compares the previous pure-Python helpers (kept below as the reference) with
+GradeSuggestionEngine._iqr_filter / _count_in_ranges on synthetic voltages.
+
+Usage:
+  python benchmarks/bench_grade_vectorization.py                 # 1e5, 1e6, 1e7
+  python benchmarks/bench_grade_vectorization.py --sizes 100000 1000000
+  python benchmarks/bench_grade_vectorization.py --skip-legacy-above 1000000
+"""
+
+import argparse
+import math
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from cellsuggestion import GradeSuggestionEngine  # noqa: E402
+
+
+# -----------------------
+# Previous implementations (reference)
+# -----------------------
+def legacy_iqr_filter(volts, iqr_multiplier=1.5):
+    if not volts:
+        return [], []
+    sorted_idx = sorted(range(len(volts)), key=lambda i: volts[i])
+    sorted_v = [volts[i] for i in sorted_idx]
+
+    def _quantile(arr, q):
+        pos = (len(arr) - 1) * q
+        lo = math.floor(pos)
+        hi = math.ceil(pos)
+        if lo == hi:
+            return arr[int(pos)]
+        frac = pos - lo
+        return arr[lo] * (1 - frac) + arr[hi] * frac
+
+    q1 = _quantile(sorted_v, 0.25)
+    q3 = _quantile(sorted_v, 0.75)
+    iqr = q3 - q1
+    low = q1 - iqr_multiplier * iqr
+    high = q3 + iqr_multiplier * iqr
+    kept = [i for i, v in enumerate(volts) if low <= v <= high]
+    return [volts[i] for i in kept], kept
+
+
+def legacy_count(filtered_volts, bins):
+    return [sum(1 for v in filtered_volts if mn <= v <= mx) for mn, mx in bins]
+
+
+def synthetic_voltages(n, seed=0):
+    """Three rejected-cell clusters + a few outliers, rounded like Cell_Voltage_Actual."""
+    rng = np.random.default_rng(seed)
+    parts = [rng.normal(3.2, 0.08, int(n * 0.29)),
+             rng.normal(4.1, 0.05, int(n * 0.48)),
+             rng.normal(5.6, 0.07, n - int(n * 0.29) - int(n * 0.48) - 3),
+             np.array([6.8, 7.0, 1.2])]
+    return np.round(np.concatenate(parts), 4)
+
+
+def timed(fn, *args):
+    t0 = time.perf_counter()
+    out = fn(*args)
+    return out, time.perf_counter() - t0
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--sizes", type=int, nargs="+", default=[10 ** 5, 10 ** 6, 10 ** 7])
+    ap.add_argument("--skip-legacy-above", type=int, default=None,
+                    help="only time the vectorized path for sizes above this")
+    args = ap.parse_args()
+
+    engine = GradeSuggestionEngine()
+    print(f"{'cells':>10} | {'step':<12} | {'legacy s':>9} | {'numpy s':>9} | {'speed-up':>8}")
+    print("-" * 60)
+    for n in args.sizes:
+        volts = synthetic_voltages(n)
+        filtered, t_iqr = timed(GradeSuggestionEngine._iqr_filter, volts, engine.iqr_multiplier)
+        vmin, vmax = float(filtered[0].min()), float(filtered[0].max())
+        width = (vmax - vmin) / engine.grade_count
+        bins = GradeSuggestionEngine._make_non_overlapping(
+            [(vmin + i * width, vmin + (i + 1) * width) for i in range(engine.grade_count)],
+            round_digits=engine.round_digits)
+        counts, t_cnt = timed(GradeSuggestionEngine._count_in_ranges, filtered[0], bins)
+
+        run_legacy = args.skip_legacy_above is None or n <= args.skip_legacy_above
+        if run_legacy:
+            volts_list = volts.tolist()
+            legacy_filtered, t_iqr_old = timed(legacy_iqr_filter, volts_list, engine.iqr_multiplier)
+            legacy_counts, t_cnt_old = timed(legacy_count, legacy_filtered[0], bins)
+            assert len(legacy_filtered[0]) == len(filtered[0])
+            assert legacy_counts == counts.tolist()
+
+        for step, t_new, t_old in (("iqr_filter", t_iqr, t_iqr_old if run_legacy else None),
+                                   ("bin_count", t_cnt, t_cnt_old if run_legacy else None)):
+            old_s = f"{t_old:9.3f}" if t_old is not None else f"{'-':>9}"
+            ratio = f"{t_old / t_new:7.1f}x" if t_old is not None and t_new > 0 else f"{'-':>8}"
+            print(f"{n:>10} | {step:<12} | {old_s} | {t_new:9.4f} | {ratio}")
+
+
+if __name__ == "__main__":
+    main()
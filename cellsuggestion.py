@@ -6,6 +6,8 @@ B) k-means clustering (k=6)
 Input:
   rejected_cells: list of dicts:
     [{"cell_id":"C001","measured_voltage":3.65,"measured_current":0.7}, ...]
+  or, for the *_arrays entry points, NumPy columns of voltage and IR
+  (two 1-D arrays or one (N, 2) array) — no per-row dicts needed.
 Returns:
   {
     "grades": [
@@ -19,16 +21,50 @@ Returns:
   }
 Notes:
  - Uses IQR method to remove extreme outliers (configurable)
+ - QuantileSketch / StreamingGradeHistogram summarise readings per day so long ranges
+   can be merged instead of re-read (see their docstrings for the error bound)
  - Rounds ranges to `round_digits` decimals (default 2)
  - KMeans requires scikit-learn; code will ask to pip install if missing
+ - method="dp" gives the exact optimal 1-D clustering instead (no scikit-learn)
 """
 
+from dataclasses import dataclass, asdict, fields, replace
 from typing import List, Dict, Tuple, Optional
-import math
 
 import numpy as np
 
 
+@dataclass(frozen=True)
+class GradeConfig:
+    """
+    Immutable binning settings for one grading request (or one named saved config).
+    Build a new one per request instead of sharing mutable settings between requests.
+    """
+    ir_bin_width: float = 0.05
+    ir_underflow: float = 1.5
+    ir_overflow: float = 2.2
+    voltage_bin_width: float = 0.003
+    voltage_underflow: float = 3.27
+    voltage_overflow: float = 3.3
+
+    def __post_init__(self):
+        for f in fields(self):
+            object.__setattr__(self, f.name, float(getattr(self, f.name)))
+        if self.ir_bin_width <= 0 or self.voltage_bin_width <= 0:
+            raise ValueError("bin widths must be positive")
+        if self.ir_underflow >= self.ir_overflow or self.voltage_underflow >= self.voltage_overflow:
+            raise ValueError("underflow must be below overflow")
+
+    @classmethod
+    def from_dict(cls, data: Dict, base: Optional["GradeConfig"] = None) -> "GradeConfig":
+        """Copy of base (default: the class defaults) with any config keys present in data."""
+        overrides = {f.name: data[f.name] for f in fields(cls) if data.get(f.name) is not None}
+        return replace(base or cls(), **overrides)
+
+    def to_dict(self) -> Dict:
+        return asdict(self)
+
+
 class GradeSuggestionEngine:
     """
     Class for generating grade range suggestions for rejected cells.
@@ -54,6 +90,14 @@ class GradeSuggestionEngine:
         self.voltage_overflow = VOLTAGE_OVERFLOW
         self.voltage_underflow = VOLTAGE_UNDERFLOW
 
+    @classmethod
+    def from_config(cls, config: GradeConfig, **kwargs) -> "GradeSuggestionEngine":
+        """Engine using the bin settings of a GradeConfig (kwargs: grade_count, iqr_multiplier, round_digits)."""
+        return cls(IR_BIN_WIDTH=config.ir_bin_width, IR_OVERFLOW=config.ir_overflow,
+                   IR_UNDERFLOW=config.ir_underflow, VOLTAGE_BIN_WIDTH=config.voltage_bin_width,
+                   VOLTAGE_OVERFLOW=config.voltage_overflow, VOLTAGE_UNDERFLOW=config.voltage_underflow,
+                   **kwargs)
+
     def suggest_both_methods(self, rejected_cells: List[Dict], random_state: Optional[int] = 42) -> Dict:
         """
         Generate suggestions using both methods.
@@ -77,14 +121,58 @@ class GradeSuggestionEngine:
             # "kmeans": kmeans_result
         }
 
-    def suggest_ranges_equal_width(self, rejected_cells: List[Dict]) -> Dict:
+    def suggest_both_methods_arrays(self, voltages, resistances=None, random_state: Optional[int] = 42,
+                                    kmeans_method: Optional[str] = None, joint: bool = False) -> Dict:
+        """
+        Same as suggest_both_methods, but takes the readings as NumPy columns.
 
+        Args:
+            voltages: 1-D array of voltages, or an (N, 2) array of [voltage, resistance]
+            resistances: 1-D array of resistances (omit when voltages is 2-column)
+            random_state: Random seed for k-means (default 42)
+            kmeans_method: "sklearn" or "dp" to also return clustered ranges under "kmeans"
+            joint: also return the voltage x IR histogram under "joint" (left out when
+                there is no IR data: the 1-D result is all there is)
+        """
+        results = {
+            "final_results": self.suggest_ranges_equal_width_arrays(voltages, resistances)
+        }
+        if joint:
+            joint_result = self.joint_histogram_arrays(voltages, resistances)
+            if joint_result is not None:
+                results["joint"] = joint_result
+        if kmeans_method:
+            data_voltage, _ = self._split_columns(voltages, resistances)
+            try:
+                results["kmeans"] = self.suggest_ranges_kmeans_arrays(data_voltage, random_state=random_state,
+                                                                      method=kmeans_method)
+            except RuntimeError as e:
+                results["kmeans"] = {"error": str(e), "grades": [], "total_cells": 0,
+                                     "accepted_count": 0, "accepted_pct": 0.0, "ignored_outliers_count": 0}
+        return results
+
+    def suggest_ranges_equal_width(self, rejected_cells: List[Dict]) -> Dict:
         """Generate grade ranges using equal-width binning."""
+        return self.suggest_ranges_equal_width_arrays(
+            self._extract_voltages(rejected_cells),
+            self._extract_resistance(rejected_cells),
+            total_cells=len(rejected_cells),
+        )
 
-        volts = self._extract_voltages(rejected_cells)
-        total = len(volts)
-        ir = self._extract_resistance(rejected_cells)
-        total_ir = len(ir)
+    def suggest_ranges_equal_width_arrays(self, voltages, resistances=None, total_cells: Optional[int] = None) -> Dict:
+        """
+        Generate grade ranges using equal-width binning on NumPy columns.
+
+        Args:
+            voltages: 1-D array of voltages, or an (N, 2) array of [voltage, resistance]
+            resistances: 1-D array of resistances (omit when voltages is 2-column)
+            total_cells: Cells reported as total_cells (default: number of rows passed in)
+        """
+        data_voltage, data_ir = self._split_columns(voltages, resistances)
+        if total_cells is None:
+            total_cells = max(len(data_voltage), len(data_ir))
+        volts = self._voltage_array(data_voltage)
+        ir = self._resistance_array(data_ir)
         # print(f"len:{len(volts)} ")
         #
         # print(f"len: {len(ir)} ")
@@ -92,7 +180,7 @@ class GradeSuggestionEngine:
         BIN_WIDTH_voltage = self.voltage_bin_width
         MIN_VAL_voltage = self.voltage_underflow
         MAX_VAL_voltage = self.voltage_overflow
-        data_voltage=np.array(volts)
+        data_voltage = volts
         # Separate underflow / overflow
         underflow = data_voltage[data_voltage < MIN_VAL_voltage]
         overflow = data_voltage[data_voltage > MAX_VAL_voltage]
@@ -106,7 +194,7 @@ class GradeSuggestionEngine:
 
         hist_voltage, bin_edges_voltage = np.histogram(in_range_voltage, bins=bins_voltage)
         hist_voltage = [underflow_count_voltage] + hist_voltage.tolist() + [overflow_count_voltage]
-        bin_edges_voltage = [f"<{MIN_VAL_voltage}"] + [f"{round(bin_edges_voltage[i],4)} - {round(bin_edges_voltage[i+1],4)}" for i in range(len(bin_edges_voltage)-1)] + [f">{MAX_VAL_voltage}"]
+        bin_edges_voltage = self._bin_labels(bin_edges_voltage, MIN_VAL_voltage, MAX_VAL_voltage)
         #
         # print("Underflow count:", len(underflow))
         # print("Overflow count:", len(overflow))
@@ -118,7 +206,7 @@ class GradeSuggestionEngine:
         BIN_WIDTH_ir = self.ir_bin_width
         MIN_VAL_ir = self.ir_underflow
         MAX_VAL_ir = self.ir_overflow
-        data_ir = np.array(ir)
+        data_ir = ir
         # Separate underflow / overflow
         underflow = data_ir[data_ir < MIN_VAL_ir]
         overflow = data_ir[data_ir > MAX_VAL_ir]
@@ -132,7 +220,7 @@ class GradeSuggestionEngine:
 
         hist_ir, bin_edges_ir = np.histogram(in_range_ir, bins=bins_ir)
         hist_ir = [underflow_count_ir] + hist_ir.tolist() + [overflow_count_ir]
-        bin_edges_ir = [f"<{MIN_VAL_ir}"] + [f"{round(bin_edges_ir[i],4)} - {round(bin_edges_ir[i+1],4)}" for i in range(len(bin_edges_ir)-1)] + [f">{MAX_VAL_ir}"]
+        bin_edges_ir = self._bin_labels(bin_edges_ir, MIN_VAL_ir, MAX_VAL_ir)
         #
         # print("Underflow count:", len(underflow))
         # print("Overflow count:", len(overflow))
@@ -145,7 +233,7 @@ class GradeSuggestionEngine:
             "bin_edges_voltage" : bin_edges_voltage,
             "hist_ir" : hist_ir,
             "bin_edges_ir" : bin_edges_ir,
-            "total_cells" : len(rejected_cells),
+            "total_cells" : total_cells,
             "ignored_outliers_count" : underflow_count_voltage + underflow_count_ir + overflow_count_voltage + overflow_count_ir
         }
         # if total == 0:
@@ -154,12 +242,12 @@ class GradeSuggestionEngine:
         #
         # filtered_volts, kept_idx = self._iqr_filter(volts, iqr_multiplier=self.iqr_multiplier)
         # ignored = total - len(filtered_volts)
-        # if not filtered_volts:
+        # if len(filtered_volts) == 0:
         #     return {"grades": [], "total_cells": total, "accepted_count": 0, "accepted_pct": 0.0,
         #             "ignored_outliers_count": ignored}
         #
-        # vmin = min(filtered_volts)
-        # vmax = max(filtered_volts)
+        # vmin = float(filtered_volts.min())
+        # vmax = float(filtered_volts.max())
         # if vmin == vmax:
         #     bins = [(vmin, vmax) for _ in range(self.grade_count)]
         # else:
@@ -173,8 +261,9 @@ class GradeSuggestionEngine:
         # bins = self._make_non_overlapping(bins, round_digits=self.round_digits)
         #
         # grades = []
+        # counts = self._count_in_ranges(filtered_volts, bins)
         # for idx, (mn, mx) in enumerate(bins):
-        #     count = sum(1 for v in filtered_volts if mn <= v <= mx)
+        #     count = int(counts[idx])
         #     pct = 100.0 * count / total if total > 0 else 0.0
         #     grades.append({
         #         "grade_name": f"Grade {idx + 1}",
@@ -193,28 +282,111 @@ class GradeSuggestionEngine:
         #     "ignored_outliers_count": ignored
         # }
 
-    def suggest_ranges_kmeans(self, rejected_cells: List[Dict], random_state: Optional[int] = 42) -> Dict:
-        """Generate grade ranges using k-means clustering."""
-        volts = self._extract_voltages(rejected_cells)
+    def suggest_ranges_from_bin_counts(self, total_cells: int, voltage_counts: Dict, ir_counts: Dict) -> Dict:
+        """
+        Build the equal-width result from bin counts that were already computed
+        elsewhere (e.g. GROUP BY on the SQL server), without the raw readings.
+
+        Args:
+            total_cells: Number of rejected cells the counts were taken over
+            voltage_counts / ir_counts: {"underflow": n, "overflow": n, "bins": {bin_index: n}}
+                where bin_index = FLOOR((value - underflow) / bin_width)
+
+        Returns:
+            Same dict as suggest_ranges_equal_width
+        """
+        hist_voltage, bin_edges_voltage = self._hist_from_counts(
+            voltage_counts, self.voltage_underflow, self.voltage_overflow, self.voltage_bin_width)
+        hist_ir, bin_edges_ir = self._hist_from_counts(
+            ir_counts, self.ir_underflow, self.ir_overflow, self.ir_bin_width)
+
+        return {
+            "hist_voltage" : hist_voltage,
+            "bin_edges_voltage" : bin_edges_voltage,
+            "hist_ir" : hist_ir,
+            "bin_edges_ir" : bin_edges_ir,
+            "total_cells" : total_cells,
+            "ignored_outliers_count" : hist_voltage[0] + hist_voltage[-1] + hist_ir[0] + hist_ir[-1]
+        }
+
+    def joint_histogram_arrays(self, voltages, resistances=None) -> Dict:
+        """
+        Joint voltage x IR histogram of the rejected cells in one vectorized pass.
+
+        Only cells with both a usable voltage (>= 3 V) and IR (<= 5 ohm) are counted.
+        Each axis has the same bins as suggest_ranges_equal_width, including the
+        underflow (first) and overflow (last) bins, so counts[i][j] is the number of
+        cells in voltage bin i and IR bin j. None when there is no IR column (or it is
+        empty) while there are voltages.
+        """
+        data_voltage, data_ir = self._split_columns(voltages, resistances)
+        if data_ir.size == 0 and data_voltage.size:
+            return None
+        if data_ir.shape != data_voltage.shape:
+            raise ValueError("voltage and IR columns must have the same length for the joint histogram")
+        keep = (data_voltage >= 3) & (data_ir <= 5)
+        volts = np.round(data_voltage[keep], 4)
+        ir = data_ir[keep]
+
+        edges_v = self._bin_edges(self.voltage_underflow, self.voltage_overflow, self.voltage_bin_width)
+        edges_ir = self._bin_edges(self.ir_underflow, self.ir_overflow, self.ir_bin_width)
+        v_idx = self._bin_index(volts, edges_v, self.voltage_underflow, self.voltage_overflow)
+        ir_idx = self._bin_index(ir, edges_ir, self.ir_underflow, self.ir_overflow)
+        n_ir = len(edges_ir) + 1  # bins + underflow + overflow
+        flat = np.bincount(v_idx * n_ir + ir_idx, minlength=(len(edges_v) + 1) * n_ir)
+        return self._joint_result(flat.reshape(len(edges_v) + 1, n_ir), edges_v, edges_ir)
+
+    def joint_histogram_from_bin_counts(self, joint_counts: Dict) -> Dict:
+        """
+        Same result as joint_histogram_arrays from sparse counts computed elsewhere (e.g. SQL
+        GROUP BY of both bin indices): {(voltage_bin, ir_bin): n}, where a bin is
+        FLOOR((value - underflow) / bin_width) and -1 / -2 mean underflow / overflow.
+        """
+        edges_v = self._bin_edges(self.voltage_underflow, self.voltage_overflow, self.voltage_bin_width)
+        edges_ir = self._bin_edges(self.ir_underflow, self.ir_overflow, self.ir_bin_width)
+        counts = np.zeros((len(edges_v) + 1, len(edges_ir) + 1), dtype=np.int64)
+        for (v_bin, ir_bin), n in joint_counts.items():
+            counts[self._sparse_to_dense_bin(v_bin, len(edges_v) - 1),
+                   self._sparse_to_dense_bin(ir_bin, len(edges_ir) - 1)] += int(n)
+        return self._joint_result(counts, edges_v, edges_ir)
+
+    def _joint_result(self, counts: np.ndarray, edges_v: np.ndarray, edges_ir: np.ndarray) -> Dict:
+        return {
+            "bin_edges_voltage": self._bin_labels(edges_v, self.voltage_underflow, self.voltage_overflow),
+            "bin_edges_ir": self._bin_labels(edges_ir, self.ir_underflow, self.ir_overflow),
+            "counts": counts.tolist(),
+            "total_cells": int(counts.sum()),
+        }
+
+    def suggest_ranges_kmeans(self, rejected_cells: List[Dict], random_state: Optional[int] = 42,
+                              method: str = "sklearn") -> Dict:
+        """
+        Generate grade ranges using k-means clustering.
+
+        method="sklearn" runs KMeans; method="dp" uses the exact 1-D optimal
+        segmentation (deterministic, no scikit-learn needed).
+        """
+        return self.suggest_ranges_kmeans_arrays(self._extract_voltages(rejected_cells),
+                                                 random_state=random_state, method=method)
+
+    def suggest_ranges_kmeans_arrays(self, voltages, random_state: Optional[int] = 42,
+                                     method: str = "sklearn") -> Dict:
+        """Generate grade ranges by clustering a NumPy column of voltages (see suggest_ranges_kmeans)."""
+        if method not in ("sklearn", "dp"):
+            raise ValueError(f"Unknown clustering method: {method}")
+        volts = self._voltage_array(voltages)
         total = len(volts)
         if total == 0:
             return {"grades": [], "total_cells": 0, "accepted_count": 0, "accepted_pct": 0.0,
                     "ignored_outliers_count": 0}
         filtered_volts, kept_idx = self._iqr_filter(volts, iqr_multiplier=self.iqr_multiplier)
         ignored = total - len(filtered_volts)
-        if not filtered_volts:
+        if len(filtered_volts) == 0:
             return {"grades": [], "total_cells": total, "accepted_count": 0, "accepted_pct": 0.0,
                     "ignored_outliers_count": ignored}
 
-        X = [[v] for v in filtered_volts]
-
-        try:
-            from sklearn.cluster import KMeans
-        except Exception as e:
-            raise RuntimeError("scikit-learn is required for kmeans. Install with: pip install scikit-learn") from e
-
         if len(filtered_volts) < self.grade_count:
-            unique_sorted = sorted(set(filtered_volts))
+            unique_sorted = np.unique(filtered_volts).tolist()
             bins = []
             for i, uv in enumerate(unique_sorted):
                 mn = uv - 0.0001
@@ -223,20 +395,31 @@ class GradeSuggestionEngine:
             while len(bins) < self.grade_count:
                 bins.append((unique_sorted[-1] + 0.001 * len(bins), unique_sorted[-1] + 0.002 * len(bins)))
             bins = self._make_non_overlapping(bins, round_digits=self.round_digits)
+        elif method == "dp":
+            cluster_ranges = self._optimal_1d_ranges(filtered_volts, self.grade_count)
+            bins = self._make_non_overlapping(cluster_ranges, round_digits=self.round_digits)
         else:
+            try:
+                from sklearn.cluster import KMeans
+            except Exception as e:
+                raise RuntimeError("scikit-learn is required for kmeans. Install with: pip install scikit-learn") from e
+
+            X = filtered_volts.reshape(-1, 1)
             km = KMeans(n_clusters=self.grade_count, random_state=random_state, n_init='auto')
             labels = km.fit_predict(X)
-            cluster_ranges = []
-            for k in range(self.grade_count):
-                cluster_vs = [filtered_volts[i] for i, lab in enumerate(labels) if lab == k]
-                if cluster_vs:
-                    cluster_ranges.append((min(cluster_vs), max(cluster_vs)))
-            cluster_ranges = sorted(cluster_ranges, key=lambda x: x[0])
+            # per-cluster min / max in one pass instead of a scan per cluster
+            mins = np.full(self.grade_count, np.inf)
+            maxs = np.full(self.grade_count, -np.inf)
+            np.minimum.at(mins, labels, X[:, 0])
+            np.maximum.at(maxs, labels, X[:, 0])
+            present = np.bincount(labels, minlength=self.grade_count) > 0
+            cluster_ranges = sorted(zip(mins[present].tolist(), maxs[present].tolist()), key=lambda x: x[0])
             bins = self._make_non_overlapping(cluster_ranges, round_digits=self.round_digits)
 
         grades = []
+        counts = self._count_in_ranges(filtered_volts, bins)
         for idx, (mn, mx) in enumerate(bins):
-            count = sum(1 for v in filtered_volts if mn <= v <= mx)
+            count = int(counts[idx])
             pct = 100.0 * count / total if total > 0 else 0.0
             grades.append({
                 "grade_name": f"Grade {idx + 1}",
@@ -255,6 +438,241 @@ class GradeSuggestionEngine:
             "ignored_outliers_count": ignored
         }
 
+    def quantile_summary(self, sketch: "QuantileSketch", percentiles=(1, 5, 25, 50, 75, 95, 99)) -> Dict:
+        """
+        Percentiles and the IQR outlier bounds (same rule as _iqr_filter) from a
+        QuantileSketch. "max_error" bounds how far each value can be from the exact
+        np.percentile result (ranks are exact). An empty sketch gives None for every
+        percentile and bound.
+        """
+        if sketch.count == 0:
+            return self._empty_quantile_summary(percentiles, sketch.max_error)
+        values = sketch.quantiles([p / 100.0 for p in percentiles] + [0.25, 0.75])
+        return self._quantile_summary(sketch.count, percentiles, values, sketch.max_error)
+
+    def _quantile_summary(self, count: int, percentiles, values, max_error: float) -> Dict:
+        q1, q3 = float(values[-2]), float(values[-1])
+        iqr = q3 - q1
+        return {
+            "count": count,
+            "percentiles": {str(p): float(v) for p, v in zip(percentiles, values[:-2])},
+            "q1": q1,
+            "q3": q3,
+            "iqr": iqr,
+            "low": q1 - self.iqr_multiplier * iqr,
+            "high": q3 + self.iqr_multiplier * iqr,
+            "max_error": max_error,
+        }
+
+    @staticmethod
+    def _empty_quantile_summary(percentiles, max_error: float) -> Dict:
+        """No values: every statistic is None (JSON null) rather than NaN."""
+        return {
+            "count": 0,
+            "percentiles": {str(p): None for p in percentiles},
+            "q1": None,
+            "q3": None,
+            "iqr": None,
+            "low": None,
+            "high": None,
+            "max_error": max_error,
+        }
+
+    def quantile_summary_arrays(self, values, percentiles=(1, 5, 25, 50, 75, 95, 99)) -> Dict:
+        """Exact counterpart of quantile_summary on a NumPy column (max_error 0)."""
+        values = np.asarray(values, dtype=float)
+        if values.size == 0:
+            return self._empty_quantile_summary(percentiles, 0.0)
+        qs = np.percentile(values, list(percentiles) + [25, 75])
+        return self._quantile_summary(int(values.size), percentiles, qs, 0.0)
+
+    def suggest_ranges_kmeans_sketch(self, sketch: "QuantileSketch", random_state: Optional[int] = 42,
+                                     method: str = "dp") -> Dict:
+        """
+        suggest_ranges_kmeans_arrays on a voltage QuantileSketch: IQR filter, clustering and
+        grade counts all run on the distinct values weighted by their counts. With the 1e-4
+        voltage sketch "dp" gives exactly the result of the array path; "sklearn" passes the
+        counts as sample_weight, so its (heuristic) clusters can differ slightly.
+        """
+        if method not in ("sklearn", "dp"):
+            raise ValueError(f"Unknown clustering method: {method}")
+        x, w = sketch.values_counts()
+        total = int(w.sum())
+        if total == 0:
+            return {"grades": [], "total_cells": 0, "accepted_count": 0, "accepted_pct": 0.0,
+                    "ignored_outliers_count": 0}
+        q1, q3 = QuantileSketch.weighted_quantiles(x, w, [0.25, 0.75])
+        iqr = q3 - q1
+        keep = (x >= q1 - self.iqr_multiplier * iqr) & (x <= q3 + self.iqr_multiplier * iqr)
+        x, w = x[keep], w[keep]
+        kept_total = int(w.sum())
+        ignored = total - kept_total
+        if kept_total == 0:
+            return {"grades": [], "total_cells": total, "accepted_count": 0, "accepted_pct": 0.0,
+                    "ignored_outliers_count": ignored}
+
+        if kept_total < self.grade_count:
+            unique_sorted = x.tolist()
+            bins = [(uv - 0.0001, uv + 0.0001) for uv in unique_sorted]
+            while len(bins) < self.grade_count:
+                bins.append((unique_sorted[-1] + 0.001 * len(bins), unique_sorted[-1] + 0.002 * len(bins)))
+        elif method == "dp":
+            bins = self._optimal_1d_ranges(x, self.grade_count, weights=w)
+        else:
+            try:
+                from sklearn.cluster import KMeans
+            except Exception as e:
+                raise RuntimeError("scikit-learn is required for kmeans. Install with: pip install scikit-learn") from e
+            km = KMeans(n_clusters=min(self.grade_count, len(x)), random_state=random_state, n_init='auto')
+            labels = km.fit_predict(x.reshape(-1, 1), sample_weight=w)
+            bins = sorted((float(x[labels == c].min()), float(x[labels == c].max())) for c in np.unique(labels))
+        bins = self._make_non_overlapping(bins, round_digits=self.round_digits)
+
+        cw = np.concatenate(([0], np.cumsum(w)))
+        grades = []
+        for idx, (mn, mx) in enumerate(bins):
+            count = int(cw[np.searchsorted(x, mx, side="right")] - cw[np.searchsorted(x, mn, side="left")])
+            grades.append({
+                "grade_name": f"Grade {idx + 1}",
+                "vmin": round(mn, self.round_digits),
+                "vmax": round(mx, self.round_digits),
+                "count": count,
+                "pct": round(100.0 * count / total, 2)
+            })
+        accepted_count = sum(g["count"] for g in grades)
+        return {
+            "grades": grades,
+            "total_cells": total,
+            "accepted_count": accepted_count,
+            "accepted_pct": round(100.0 * accepted_count / total, 2),
+            "ignored_outliers_count": ignored
+        }
+
+    @staticmethod
+    def _bin_labels(bin_edges, min_val: float, max_val: float) -> List[str]:
+        """Labels for [underflow] + one per bin + [overflow], as shown on the suggestions page."""
+        return [f"<{min_val}"] + [f"{round(bin_edges[i],4)} - {round(bin_edges[i+1],4)}" for i in range(len(bin_edges)-1)] + [f">{max_val}"]
+
+    @staticmethod
+    def _bin_edges(min_val: float, max_val: float, bin_width: float) -> np.ndarray:
+        return np.arange(min_val, max_val + bin_width, bin_width)
+
+    @staticmethod
+    def _bin_index(values: np.ndarray, bin_edges: np.ndarray, min_val: float, max_val: float) -> np.ndarray:
+        """
+        Dense bin index per value: 0 = underflow, 1..n = bins (as np.histogram assigns them,
+        last bin closed on the right), n + 1 = overflow.
+        """
+        n_bins = len(bin_edges) - 1
+        idx = np.clip(np.searchsorted(bin_edges, values, side="right"), 1, n_bins)
+        idx[values < min_val] = 0
+        idx[values > max_val] = n_bins + 1
+        return idx
+
+    @staticmethod
+    def _sparse_to_dense_bin(bin_idx: int, n_bins: int) -> int:
+        """FLOOR-style bin (-1 underflow, -2 overflow) -> _bin_index numbering."""
+        bin_idx = int(bin_idx)
+        if bin_idx == -1:
+            return 0
+        if bin_idx == -2:
+            return n_bins + 1
+        # np.histogram closes the last bin on the right, so the top edge lands in the last bin
+        return min(max(bin_idx, 0), n_bins - 1) + 1
+
+    @classmethod
+    def _hist_from_counts(cls, counts: Dict, min_val: float, max_val: float, bin_width: float) -> Tuple[List[int], List[str]]:
+        """Expand sparse {bin_index: count} into the dense histogram np.histogram would return."""
+        bin_edges = cls._bin_edges(min_val, max_val, bin_width)
+        n_bins = len(bin_edges) - 1
+        hist = [0] * n_bins
+        for idx, cnt in (counts.get("bins") or {}).items():
+            hist[cls._sparse_to_dense_bin(idx, n_bins) - 1] += int(cnt)
+        hist = [int(counts.get("underflow", 0))] + hist + [int(counts.get("overflow", 0))]
+        return hist, cls._bin_labels(bin_edges, min_val, max_val)
+
+    @staticmethod
+    def _optimal_1d_ranges(values: np.ndarray, k: int, weights: Optional[np.ndarray] = None) -> List[Tuple[float, float]]:
+        """
+        Exact 1-D k-means: split the sorted values into k contiguous groups that minimise the
+        total within-group sum of squares (same objective as KMeans, but the global optimum).
+
+        Runs the DP on the unique values weighted by their counts (readings are rounded to
+        4 decimals, so there are few of them). Each layer is filled by divide & conquer over
+        the monotone split points; segment costs come from prefix sums in O(1).
+        Pass weights to give already-distinct sorted values with their counts (a sketch).
+        Returns [(min, max), ...] per group, in ascending order.
+        """
+        if weights is None:
+            x, w = np.unique(np.asarray(values, dtype=float), return_counts=True)
+        else:
+            x, w = np.asarray(values, dtype=float), np.asarray(weights)
+        m = len(x)
+        k = max(1, min(k, m))
+        x_c = x - x.mean()  # centre to keep S*S/W from cancelling
+        w = w.astype(float)
+        cw = np.concatenate(([0.0], np.cumsum(w)))
+        cs = np.concatenate(([0.0], np.cumsum(w * x_c)))
+        css = np.concatenate(([0.0], np.cumsum(w * x_c * x_c)))
+
+        def seg_cost(j, i):
+            """Within-group SSE of x[j..i] (inclusive); j may be an array."""
+            s_w = cw[i + 1] - cw[j]
+            s_x = cs[i + 1] - cs[j]
+            return (css[i + 1] - css[j]) - s_x * s_x / s_w
+
+        cost_prev = seg_cost(0, np.arange(m))
+        back = np.zeros((k, m), dtype=np.int64)
+        for q in range(1, k):
+            cost_cur = np.full(m, np.inf)
+            # (i_lo, i_hi, j_lo, j_hi): fill cost_cur[i_lo..i_hi] with the last group starting in [j_lo, j_hi]
+            stack = [(q, m - 1, q, m - 1)]
+            while stack:
+                i_lo, i_hi, j_lo, j_hi = stack.pop()
+                if i_lo > i_hi:
+                    continue
+                mid = (i_lo + i_hi) // 2
+                js = np.arange(max(j_lo, q), min(j_hi, mid) + 1)
+                cand = cost_prev[js - 1] + seg_cost(js, mid)
+                best = int(np.argmin(cand))
+                cost_cur[mid] = cand[best]
+                j_best = int(js[best])
+                back[q, mid] = j_best
+                stack.append((i_lo, mid - 1, j_lo, j_best))
+                stack.append((mid + 1, i_hi, j_best, j_hi))
+            cost_prev = cost_cur
+
+        starts = [0] * k
+        i = m - 1
+        for q in range(k - 1, 0, -1):
+            starts[q] = int(back[q, i])
+            i = starts[q] - 1
+        starts = np.asarray(starts)
+        ends = np.append(starts[1:] - 1, m - 1)
+        return list(zip(x[starts].tolist(), x[ends].tolist()))
+
+    @staticmethod
+    def _split_columns(voltages, resistances=None) -> Tuple[np.ndarray, np.ndarray]:
+        """Accept separate voltage / resistance columns or one (N, 2) array; returns float64 columns."""
+        data = np.asarray(voltages, dtype=float)
+        if resistances is None and data.ndim == 2:
+            return data[:, 0], data[:, 1]
+        if resistances is None:
+            return data, np.empty(0)
+        return data, np.asarray(resistances, dtype=float)
+
+    @staticmethod
+    def _voltage_array(voltages: np.ndarray) -> np.ndarray:
+        """Vectorized _extract_voltages: keep readings >= 3 V, rounded to 4 decimals (NaN dropped)."""
+        voltages = np.asarray(voltages, dtype=float)
+        return np.round(voltages[voltages >= 3], 4)
+
+    @staticmethod
+    def _resistance_array(resistances: np.ndarray) -> np.ndarray:
+        """Vectorized _extract_resistance: keep readings <= 5 ohm (NaN dropped)."""
+        resistances = np.asarray(resistances, dtype=float)
+        return resistances[resistances <= 5]
+
     @staticmethod
     def _extract_voltages(rejected_cells: List[Dict]) -> List[float]:
         volts = []
@@ -284,31 +702,28 @@ class GradeSuggestionEngine:
         return ir
 
     @staticmethod
-    def _iqr_filter(volts: List[float], iqr_multiplier: float = 1.5) -> Tuple[List[float], List[int]]:
+    def _iqr_filter(volts, iqr_multiplier: float = 1.5) -> Tuple[np.ndarray, np.ndarray]:
         """Return (filtered_volts, indices_kept). Removes points outside [Q1 - k*IQR, Q3 + k*IQR]."""
-        if not volts:
-            return [], []
-        sorted_idx = sorted(range(len(volts)), key=lambda i: volts[i])
-        sorted_v = [volts[i] for i in sorted_idx]
-        n = len(sorted_v)
-
-        def _quantile(arr, q):
-            pos = (len(arr) - 1) * q
-            lo = math.floor(pos)
-            hi = math.ceil(pos)
-            if lo == hi:
-                return arr[int(pos)]
-            frac = pos - lo
-            return arr[lo] * (1 - frac) + arr[hi] * frac
-
-        q1 = _quantile(sorted_v, 0.25)
-        q3 = _quantile(sorted_v, 0.75)
+        volts = np.asarray(volts, dtype=float)
+        if volts.size == 0:
+            return volts, np.empty(0, dtype=np.int64)
+        # linear interpolation between order statistics, as the old hand-rolled quantile did;
+        # np.percentile partitions instead of fully sorting
+        q1, q3 = np.percentile(volts, [25, 75])
         iqr = q3 - q1
         low = q1 - iqr_multiplier * iqr
         high = q3 + iqr_multiplier * iqr
-        kept = [i for i, v in enumerate(volts) if low <= v <= high]
-        filtered = [volts[i] for i in kept]
-        return filtered, kept
+        kept = np.flatnonzero((volts >= low) & (volts <= high))
+        return volts[kept], kept
+
+    @staticmethod
+    def _count_in_ranges(values: np.ndarray, ranges: List[Tuple[float, float]]) -> np.ndarray:
+        """Count values in each closed [min, max] range with one sort + one searchsorted pass."""
+        if not ranges:
+            return np.zeros(0, dtype=np.int64)
+        sorted_v = np.sort(np.asarray(values, dtype=float))
+        mins, maxs = np.asarray(ranges, dtype=float).T
+        return np.searchsorted(sorted_v, maxs, side="right") - np.searchsorted(sorted_v, mins, side="left")
 
     @staticmethod
     def _make_non_overlapping(sorted_ranges: List[Tuple[float, float]], round_digits: int = 2) -> List[
@@ -335,6 +750,288 @@ class GradeSuggestionEngine:
             out.append((round(curr_min, round_digits), round(curr_max, round_digits)))
         return out
 
+class QuantileSketch:
+    """
+    Mergeable quantile sketch: counts of values snapped to a fixed grid (resolution).
+
+    Ranks are exact; each value is off by at most max_error (resolution / 2 as long as
+    the sketch never had to compact). Values already on the grid — voltages rounded to
+    4 dp with the default 1e-4 resolution — come back exactly, so quantiles match
+    np.percentile on the raw readings. Size is bounded by the number of distinct grid
+    points, not the number of readings; past max_bins the grid is doubled (compact),
+    which grows max_error by the new resolution / 2.
+    Sketches built per day can be merged (merge) into any date range.
+    """
+
+    def __init__(self, resolution: float = 1e-4, max_bins: int = 65536):
+        self.resolution = float(resolution)
+        self.max_bins = int(max_bins)
+        self.max_error = self.resolution / 2
+        self.counts: Dict[int, int] = {}  # grid index (value / resolution) -> count
+
+    @property
+    def count(self) -> int:
+        return sum(self.counts.values())
+
+    def add(self, values) -> None:
+        keys = np.rint(np.asarray(values, dtype=float) / self.resolution).astype(np.int64)
+        uniq, counts = np.unique(keys, return_counts=True)
+        self._add_keys(uniq, counts)
+
+    def add_counts(self, values, counts) -> None:
+        """Add pre-aggregated (value, count) pairs, e.g. from a SQL GROUP BY."""
+        keys = np.rint(np.asarray(values, dtype=float) / self.resolution).astype(np.int64)
+        self._add_keys(keys, np.asarray(counts, dtype=np.int64))
+
+    def _add_keys(self, keys: np.ndarray, counts: np.ndarray) -> None:
+        for k, n in zip(keys.tolist(), counts.tolist()):
+            self.counts[k] = self.counts.get(k, 0) + n
+        while len(self.counts) > self.max_bins:
+            self._compact()
+
+    def _compact(self) -> None:
+        """Double the resolution, merging neighbouring grid points."""
+        merged: Dict[int, int] = {}
+        for k, n in self.counts.items():
+            k2 = (k + 1) // 2  # round half up onto the coarser grid
+            merged[k2] = merged.get(k2, 0) + n
+        self.counts = merged
+        self.resolution *= 2
+        self.max_error += self.resolution / 2
+
+    def merge(self, other: "QuantileSketch") -> None:
+        ratio = other.resolution / self.resolution
+        steps = int(round(np.log2(ratio)))
+        if not np.isclose(2.0 ** steps, ratio):
+            raise ValueError("sketch resolutions must differ by a power of two to merge")
+        if steps < 0:  # other is finer: compact a copy onto our grid
+            other = QuantileSketch.from_dict(other.to_dict())
+            for _ in range(-steps):
+                other._compact()
+        for _ in range(max(steps, 0)):
+            self._compact()
+        for k, n in other.counts.items():
+            self.counts[k] = self.counts.get(k, 0) + n
+        self.max_error = max(self.max_error, other.max_error)
+        while len(self.counts) > self.max_bins:
+            self._compact()
+
+    def values_counts(self) -> Tuple[np.ndarray, np.ndarray]:
+        """Sorted distinct values and their counts."""
+        if not self.counts:
+            return np.empty(0), np.empty(0, dtype=np.int64)
+        keys = np.fromiter(self.counts.keys(), dtype=np.int64, count=len(self.counts))
+        counts = np.fromiter(self.counts.values(), dtype=np.int64, count=len(self.counts))
+        order = np.argsort(keys)
+        # k / 10000 gives the same double as round(v, 4); k * 1e-4 can be one ulp off
+        inverse = 1.0 / self.resolution
+        if np.isclose(inverse, round(inverse)):
+            return keys[order] / round(inverse), counts[order]
+        return keys[order] * self.resolution, counts[order]
+
+    def quantiles(self, qs) -> np.ndarray:
+        """Quantiles (0..1) with np.percentile's linear interpolation between order statistics."""
+        return self.weighted_quantiles(*self.values_counts(), qs)
+
+    @staticmethod
+    def weighted_quantiles(x: np.ndarray, w: np.ndarray, qs) -> np.ndarray:
+        qs = np.asarray(qs, dtype=float)
+        n = int(w.sum())
+        if n == 0:
+            return np.full(qs.shape, np.nan)
+        cw = np.cumsum(w)
+        pos = (n - 1) * qs
+        lo = np.floor(pos).astype(np.int64)
+        hi = np.minimum(lo + 1, n - 1)
+        x_lo = x[np.searchsorted(cw, lo, side="right")]
+        x_hi = x[np.searchsorted(cw, hi, side="right")]
+        return x_lo + (pos - lo) * (x_hi - x_lo)
+
+    def to_dict(self) -> Dict:
+        return {
+            "resolution": self.resolution,
+            "max_bins": self.max_bins,
+            "max_error": self.max_error,
+            "counts": [[k, n] for k, n in sorted(self.counts.items())],
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> "QuantileSketch":
+        sketch = cls(resolution=data["resolution"], max_bins=data.get("max_bins", 65536))
+        sketch.max_error = float(data.get("max_error", sketch.max_error))
+        sketch.counts = {int(k): int(n) for k, n in data.get("counts", [])}
+        return sketch
+
+
+class StreamingGradeHistogram:
+    """
+    Voltage / IR sketches of rejected cells kept at a fine base resolution, so they
+    can be updated incrementally (add), merged across days (merge), re-binned to any
+    GradeConfig (bin_counts) and summarised (quantile summaries, k-means) without
+    the raw readings.
+
+    Voltages are rounded to 4 dp before binning (as everywhere else), so with the
+    default 1e-4 V base resolution the derived voltage bins are exact, with the same
+    [lo, hi) edge convention as the SQL-side FLOOR binning. IR readings are snapped
+    to the nearest 1e-4 ohm, so a reading within 0.5e-4 ohm of a bin edge may land
+    in the neighbouring bin.
+    """
+
+    VOLTAGE_RESOLUTION = 1e-4
+    IR_RESOLUTION = 1e-4
+
+    def __init__(self):
+        self.total_cells = 0
+        self.voltage = QuantileSketch(self.VOLTAGE_RESOLUTION)
+        self.ir = QuantileSketch(self.IR_RESOLUTION)
+
+    def add(self, voltages, resistances=None) -> None:
+        """Add a batch of rejected cells (same inputs as suggest_ranges_equal_width_arrays)."""
+        data_voltage, data_ir = GradeSuggestionEngine._split_columns(voltages, resistances)
+        self.total_cells += len(data_voltage)
+        self.voltage.add(GradeSuggestionEngine._voltage_array(data_voltage))
+        self.ir.add(GradeSuggestionEngine._resistance_array(data_ir))
+
+    def merge(self, other: "StreamingGradeHistogram") -> None:
+        self.total_cells += other.total_cells
+        self.voltage.merge(other.voltage)
+        self.ir.merge(other.ir)
+
+    def to_dict(self) -> Dict:
+        return {"total_cells": self.total_cells, "voltage": self.voltage.to_dict(), "ir": self.ir.to_dict()}
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> "StreamingGradeHistogram":
+        hist = cls()
+        hist.total_cells = int(data.get("total_cells", 0))
+        hist.voltage = QuantileSketch.from_dict(data["voltage"])
+        hist.ir = QuantileSketch.from_dict(data["ir"])
+        return hist
+
+    @staticmethod
+    def _coarsen(sketch: QuantileSketch, underflow: float, overflow: float, bin_width: float) -> Dict:
+        """Merge grid points into FLOOR((value - underflow) / bin_width) bins, -1 / -2 style."""
+        out = {"underflow": 0, "overflow": 0, "bins": {}}
+        if not sketch.counts:
+            return out
+        keys = np.fromiter(sketch.counts.keys(), dtype=np.int64, count=len(sketch.counts))
+        counts = np.fromiter(sketch.counts.values(), dtype=np.int64, count=len(sketch.counts))
+        # Work in grid units so edges that are multiples of the resolution are exact
+        lo = round(underflow / sketch.resolution)
+        hi = round(overflow / sketch.resolution)
+        width = bin_width / sketch.resolution
+        bins = np.floor((keys - lo) / width + 1e-9).astype(np.int64)
+        bins[keys > hi] = -2
+        bins[keys < lo] = -1
+        uniq, inverse = np.unique(bins, return_inverse=True)
+        sums = np.bincount(inverse, weights=counts).astype(np.int64)
+        for b, n in zip(uniq.tolist(), sums.tolist()):
+            if b == -1:
+                out["underflow"] = n
+            elif b == -2:
+                out["overflow"] = n
+            else:
+                out["bins"][b] = n
+        return out
+
+    def bin_counts(self, engine: "GradeSuggestionEngine") -> Tuple[int, Dict, Dict]:
+        """(total_cells, voltage_counts, ir_counts) for engine.suggest_ranges_from_bin_counts."""
+        return (
+            self.total_cells,
+            self._coarsen(self.voltage, engine.voltage_underflow, engine.voltage_overflow, engine.voltage_bin_width),
+            self._coarsen(self.ir, engine.ir_underflow, engine.ir_overflow, engine.ir_bin_width),
+        )
+
+
+class GradeTableSimulator:
+    """
+    What-if scoring of candidate grade tables against historical cell measurements.
+
+    A grade table is a list of grades:
+      [{"grade_name": "Grade 1", "vmin": 3.26, "vmax": 3.27, "irmin": 1.5, "irmax": 1.9}, ...]
+    (irmin / irmax optional). Voltage ranges within one table must not overlap, so
+    each cell is classified with one np.searchsorted on the sorted vmin edges plus
+    a vmax / IR check. Ranges may touch (3.26-3.27 then 3.27-3.28): a cell exactly on
+    the shared boundary goes to the upper grade, the one whose vmin it equals.
+    Feed chunks with add_chunk(); memory stays O(chunk).
+    """
+
+    def __init__(self, tables: List[Dict]):
+        """
+        Args:
+            tables: [{"name": "candidate A", "grades": [...]}, ...]
+        """
+        self.tables = []
+        for t_idx, table in enumerate(tables):
+            grades = sorted(table.get("grades") or [], key=lambda g: float(g["vmin"]))
+            if not grades:
+                raise ValueError(f"grade table {t_idx + 1} has no grades")
+            vmin = np.array([float(g["vmin"]) for g in grades])
+            vmax = np.array([float(g["vmax"]) for g in grades])
+            irmin = np.array([float(g["irmin"]) if g.get("irmin") is not None else -np.inf for g in grades])
+            irmax = np.array([float(g["irmax"]) if g.get("irmax") is not None else np.inf for g in grades])
+            if np.any(vmax < vmin) or np.any(vmin[1:] < vmax[:-1]):
+                raise ValueError(f"grade table {t_idx + 1}: voltage ranges must be ordered and non-overlapping")
+            self.tables.append({
+                "name": table.get("name") or f"Candidate {t_idx + 1}",
+                "grade_names": [g.get("grade_name") or f"Grade {i + 1}" for i, g in enumerate(grades)],
+                "vmin": vmin, "vmax": vmax, "irmin": irmin, "irmax": irmax,
+                "counts": np.zeros(len(grades), dtype=np.int64),
+                "recovered": 0,
+            })
+        self.total_cells = 0
+        self.rejected_cells = 0
+
+    @staticmethod
+    def classify(voltages: np.ndarray, resistances: np.ndarray, vmin: np.ndarray, vmax: np.ndarray,
+                 irmin: np.ndarray, irmax: np.ndarray) -> np.ndarray:
+        """
+        Grade index per cell (into the vmin-sorted grades), -1 if no grade accepts it.
+        A missing (NaN) IR passes a grade without IR limits and fails one with limits.
+        """
+        idx = np.searchsorted(vmin, voltages, side="right") - 1
+        safe = np.clip(idx, 0, len(vmin) - 1)
+        ir_ok = (resistances >= irmin[safe]) & (resistances <= irmax[safe])
+        ir_ok |= np.isnan(resistances) & np.isinf(irmin[safe]) & np.isinf(irmax[safe])
+        ok = (idx >= 0) & (voltages <= vmax[safe]) & ir_ok
+        return np.where(ok, idx, -1)
+
+    def add_chunk(self, voltages, resistances, rejected) -> None:
+        """Score one chunk: voltage / IR columns and a bool column (currently rejected)."""
+        voltages = np.asarray(voltages, dtype=float)
+        resistances = np.asarray(resistances, dtype=float)
+        rejected = np.asarray(rejected, dtype=bool)
+        self.total_cells += len(voltages)
+        self.rejected_cells += int(rejected.sum())
+        for t in self.tables:
+            grade = self.classify(voltages, resistances, t["vmin"], t["vmax"], t["irmin"], t["irmax"])
+            graded = grade >= 0
+            t["counts"] += np.bincount(grade[graded], minlength=len(t["counts"]))
+            t["recovered"] += int((graded & rejected).sum())
+
+    def results(self) -> List[Dict]:
+        out = []
+        for t in self.tables:
+            graded = int(t["counts"].sum())
+            out.append({
+                "name": t["name"],
+                "grades": [{
+                    "grade_name": name,
+                    "vmin": float(t["vmin"][i]),
+                    "vmax": float(t["vmax"][i]),
+                    "count": int(t["counts"][i]),
+                    "pct": round(100.0 * int(t["counts"][i]) / self.total_cells, 2) if self.total_cells else 0.0,
+                } for i, name in enumerate(t["grade_names"])],
+                "total_cells": self.total_cells,
+                "graded_count": graded,
+                "graded_pct": round(100.0 * graded / self.total_cells, 2) if self.total_cells else 0.0,
+                "rejected_cells": self.rejected_cells,
+                "recovered_count": t["recovered"],
+                "recovered_yield_pct": round(100.0 * t["recovered"] / self.rejected_cells, 2) if self.rejected_cells else 0.0,
+            })
+        return out
+
+
 # # Legacy functions for backward compatibility
 # def suggest_ranges_equal_width(
 #     rejected_cells: List[Dict],
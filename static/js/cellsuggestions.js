@@ -37,30 +37,78 @@ function formatForInput(date) {
   return `${y}-${m}-${d}T${hh}:${mm}`;
 }
 
+// Date ranges longer than this are binned on the SQL server
+const SQL_BINNING_MIN_DAYS = 31;
+
 // Chart instances
 let irChartInstance = null;
 let voltageChartInstance = null;
 
-async function fillConfigInputs() {
+const CONFIG_FIELDS = [
+    'ir_bin_width', 'ir_underflow', 'ir_overflow',
+    'voltage_bin_width', 'voltage_underflow', 'voltage_overflow'
+];
+
+// Load a saved grade config (or the defaults when name is empty) into the inputs
+async function fillConfigInputs(name = '') {
      const response = await fetch('/api/grade_config', {
         method: 'POST',
         headers: { 'Content-Type': 'application/json' },
-
+        body: JSON.stringify({ name: name })
     });
 
     const config = await response.json();
 //    console.log("API DATA:", config);
 
     if (!response.ok) {
-        throw new Error(data.error || 'API error');
+        throw new Error(config.error || 'API error');
     }
-    document.getElementById('ir_bin_width').value = config.ir_bin_width;
-    document.getElementById('ir_underflow').value = config.ir_underflow;
-    document.getElementById('ir_overflow').value = config.ir_overflow;
+    CONFIG_FIELDS.forEach(field => {
+        document.getElementById(field).value = config[field];
+    });
+    populateConfigNames(config.names, name);
+}
 
-    document.getElementById('voltage_bin_width').value = config.voltage_bin_width;
-    document.getElementById('voltage_underflow').value = config.voltage_underflow;
-    document.getElementById('voltage_overflow').value = config.voltage_overflow;
+function populateConfigNames(names, selected) {
+    const select = document.getElementById('configName');
+    select.innerHTML = '<option value="">Default</option>';
+    (names || []).forEach(n => {
+        const opt = document.createElement('option');
+        opt.value = n;
+        opt.textContent = n;
+        select.appendChild(opt);
+    });
+    select.value = selected || '';
+}
+
+// Save the current inputs as a named config
+async function saveGradeConfig() {
+    const name = document.getElementById('newConfigName').value.trim()
+        || document.getElementById('configName').value;
+    if (!name) {
+        showError('Please enter a config name');
+        return;
+    }
+    const payload = { name: name };
+    CONFIG_FIELDS.forEach(field => {
+        payload[field] = parseFloat(document.getElementById(field).value);
+    });
+    try {
+        const response = await fetch('/api/grade_config/save', {
+            method: 'POST',
+            headers: { 'Content-Type': 'application/json' },
+            body: JSON.stringify(payload)
+        });
+        const data = await response.json();
+        if (!response.ok) {
+            throw new Error(data.error || 'API error');
+        }
+        document.getElementById('newConfigName').value = '';
+        await fillConfigInputs(name);
+    } catch (err) {
+        showError(err.message);
+        console.error(err);
+    }
 }
 
 // ---------------- FETCH DATA ----------------
@@ -91,6 +139,12 @@ async function getSuggestions() {
             voltage_underflow: parseFloat(document.getElementById('voltage_underflow').value),
             voltage_overflow: parseFloat(document.getElementById('voltage_overflow').value)
         };
+        // Long ranges: let SQL Server build the bins. Shorter ranges: the server caches
+        // the fetched arrays, so re-binning after a parameter change is instant.
+        const rangeDays = (new Date(endDateTime) - new Date(startDateTime)) / 86400000;
+        if (rangeDays > SQL_BINNING_MIN_DAYS) {
+            payload.binning = 'sql';
+        }
         const response = await fetch('/api/grade_suggestions', {
             method: 'POST',
             headers: { 'Content-Type': 'application/json' },
@@ -120,6 +174,45 @@ async function getSuggestions() {
     }
 }
 
+// Today / current shift from the server's live histograms (no date range needed)
+async function getLiveSuggestions(scope) {
+    document.getElementById('loadingIndicator').style.display = 'block';
+    document.getElementById('errorMessage').style.display = 'none';
+    document.getElementById('resultsContainer').style.display = 'none';
+
+    try {
+        const payload = { scope: scope };
+        CONFIG_FIELDS.forEach(field => {
+            payload[field] = parseFloat(document.getElementById(field).value);
+        });
+        const response = await fetch('/api/grade_suggestions/live', {
+            method: 'POST',
+            headers: { 'Content-Type': 'application/json' },
+            body: JSON.stringify(payload)
+        });
+
+        const data = await response.json();
+
+        if (!response.ok) {
+            throw new Error(data.error || 'API error');
+        }
+
+        document.getElementById('loadingIndicator').style.display = 'none';
+
+        if (data.final_results.total_cells === 0) {
+            showError('No rejected cells found');
+            return;
+        }
+
+        displayResults(data.final_results);
+
+    } catch (err) {
+        document.getElementById('loadingIndicator').style.display = 'none';
+        showError(err.message);
+        console.error(err);
+    }
+}
+
 // ---------------- DISPLAY RESULTS ----------------
 function displayResults(results) {
 
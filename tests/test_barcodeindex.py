@@ -0,0 +1,64 @@
+import random
+from datetime import datetime
+
+from barcodeindex import BarcodeNgramIndex, GenealogyIndex
+
+
+def linkage(t, fg, sfg=None, m1=None, m2=None):
+    return {"DateTime": t, "FGNumber": fg, "SFGNumber": sfg, "Module01_ID": m1, "Module02_ID": m2}
+
+
+def test_genealogy_out_of_order_rows_keep_every_link():
+    genealogy = GenealogyIndex()
+    genealogy.add([linkage(datetime(2025, 2, 1), "FG1", "SFG1", "M9")])
+    genealogy.add([linkage(datetime(2025, 1, 1), "FG1", "SFG0", "M1")])
+
+    assert genealogy.fg_numbers("m1") == ["FG1"]
+    assert genealogy.fg_numbers("M9") == ["FG1"]
+    # the stored record stays the newest row; M1 is no longer part of it
+    assert genealogy.lookup("fg1")["Module01_ID"] == "M9"
+    assert genealogy.lookup("m1") is None
+    assert genealogy.related("m9") == ["FG1", "SFG1", "M9"]
+
+
+def test_genealogy_same_rows_any_order():
+    rows = [linkage(datetime(2025, 1, d), "FG1", f"SFG{d}", f"M{d}") for d in (3, 1, 2)]
+    forward, backward = GenealogyIndex(), GenealogyIndex()
+    forward.add(rows)
+    backward.add(reversed(rows))
+    for barcode in ("M1", "M2", "M3", "FG1"):
+        assert forward.fg_numbers(barcode) == backward.fg_numbers(barcode) == ["FG1"]
+        assert forward.lookup(barcode) == backward.lookup(barcode)
+    assert forward.lookup("fg1")["SFGNumber"] == "SFG3"
+
+
+def test_ngram_search_matches_substring_filter():
+    rng = random.Random(3)
+    barcodes = ["PK%02dA%05d" % (rng.randrange(20, 26), rng.randrange(100000)) for _ in range(2000)]
+    barcodes += ["pk24a00017", " PK24A00018 ", "", None, "PK24A00017"]
+    index = BarcodeNgramIndex(n=3)
+    for start in range(0, len(barcodes), 300):
+        index.add(barcodes[start:start + 300], watermark=datetime(2025, 1, 1))
+
+    distinct = []
+    for bc in barcodes:
+        bc = (bc or "").strip()
+        if bc and bc.lower() not in {d.lower() for d in distinct}:
+            distinct.append(bc)
+    assert len(index) == len(distinct)
+
+    fragments = ["a0001", "A0001", "pk24", "24a", "0001", "999", "4a000", "zzz", "pk24a00017"]
+    fragments += [bc[i:i + rng.randrange(3, 8)] for bc in rng.sample(distinct, 50) for i in [rng.randrange(4)]]
+    for fragment in fragments:
+        expected = [bc for bc in distinct if fragment.lower() in bc.lower()]
+        assert index.search(fragment) == expected, fragment
+
+
+def test_ngram_search_short_fragment_and_limit():
+    index = BarcodeNgramIndex(n=3)
+    index.add(["PK24A00017", "PK24A00018", "PK24B00001"])
+    assert index.search("a0") is None
+    assert index.search("pk24", limit=2) is None
+    assert index.search("pk24a", limit=2) == ["PK24A00017", "PK24A00018"]
+    # every n-gram present, but not contiguous
+    assert index.search("a0000") == []
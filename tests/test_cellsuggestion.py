@@ -0,0 +1,132 @@
+import itertools
+
+import numpy as np
+import pytest
+
+from cellsuggestion import GradeSuggestionEngine, GradeTableSimulator, QuantileSketch, StreamingGradeHistogram
+
+
+def test_simulator_missing_ir_passes_grades_without_ir_limits():
+    sim = GradeTableSimulator([{"grades": [
+        {"vmin": 3.26, "vmax": 3.27},
+        {"vmin": 3.27, "vmax": 3.28, "irmin": 1.5, "irmax": 1.9},
+    ]}])
+    sim.add_chunk([3.265, 3.275, 3.275], [np.nan, np.nan, 1.6], [True, True, False])
+    result = sim.results()[0]
+    assert [g["count"] for g in result["grades"]] == [1, 1]
+    assert result["recovered_count"] == 1
+
+
+def test_joint_without_ir_falls_back_to_1d():
+    engine = GradeSuggestionEngine()
+    volts = np.array([3.265, 3.27, 3.29])
+    for resistances in (None, np.empty(0)):
+        results = engine.suggest_both_methods_arrays(volts, resistances, joint=True)
+        assert "joint" not in results
+        assert results["final_results"] == engine.suggest_ranges_equal_width_arrays(volts, resistances)
+    assert engine.joint_histogram_arrays(volts) is None
+
+
+def test_joint_with_ir_counts_every_usable_cell():
+    engine = GradeSuggestionEngine()
+    results = engine.suggest_both_methods_arrays([3.265, 3.27, 3.29], [1.6, 1.7, 9.0], joint=True)
+    assert results["joint"]["total_cells"] == 2
+
+
+def brute_force_sse(x, w, k):
+    """Lowest within-group SSE over every split of sorted x into k contiguous groups."""
+    best = np.inf
+    for cuts in itertools.combinations(range(1, len(x)), k - 1):
+        sse = 0.0
+        for lo, hi in zip((0,) + cuts, cuts + (len(x),)):
+            xs, ws = x[lo:hi], w[lo:hi]
+            mean = np.average(xs, weights=ws)
+            sse += float(np.sum(ws * (xs - mean) ** 2))
+        best = min(best, sse)
+    return best
+
+
+def ranges_sse(values, ranges):
+    values = np.asarray(values, dtype=float)
+    sse = 0.0
+    for mn, mx in ranges:
+        group = values[(values >= mn) & (values <= mx)]
+        sse += float(np.sum((group - group.mean()) ** 2))
+    return sse
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_optimal_1d_ranges_matches_brute_force(seed):
+    rng = np.random.default_rng(seed)
+    values = np.round(rng.normal(3.28, 0.01, rng.integers(5, 40)), 3)
+    x, w = np.unique(values, return_counts=True)
+    k = int(rng.integers(1, min(5, len(x)) + 1))
+
+    ranges = GradeSuggestionEngine._optimal_1d_ranges(values, k)
+    assert len(ranges) == k
+    assert ranges[0][0] == x[0] and ranges[-1][1] == x[-1]
+    assert all(prev[1] < cur[0] for prev, cur in zip(ranges, ranges[1:]))
+    assert ranges_sse(values, ranges) == pytest.approx(brute_force_sse(x, w, k), abs=1e-12)
+    # distinct values + counts (the sketch path) give the same split
+    assert GradeSuggestionEngine._optimal_1d_ranges(x, k, weights=w) == ranges
+
+
+@pytest.mark.parametrize("max_bins", [65536, 64])
+def test_quantile_sketch_merge_equals_one_pass(max_bins):
+    rng = np.random.default_rng(1)
+    values = np.round(rng.normal(3.28, 0.02, 5000), 4)
+    one_pass = QuantileSketch(max_bins=max_bins)
+    one_pass.add(values)
+
+    merged = QuantileSketch(max_bins=max_bins)
+    for part in np.array_split(values, 7):
+        day = QuantileSketch(max_bins=max_bins)
+        day.add(part)
+        merged.merge(QuantileSketch.from_dict(day.to_dict()))
+
+    assert merged.counts == one_pass.counts
+    assert merged.resolution == one_pass.resolution
+    assert merged.max_error == one_pass.max_error
+    qs = [0.01, 0.25, 0.5, 0.75, 0.99]
+    np.testing.assert_array_equal(merged.quantiles(qs), one_pass.quantiles(qs))
+    if max_bins == 65536:
+        # grid values come back exactly: same answer as np.percentile on the readings
+        np.testing.assert_allclose(one_pass.quantiles(qs), np.percentile(values, [q * 100 for q in qs]),
+                                   rtol=0, atol=1e-12)
+    else:
+        assert len(one_pass.counts) <= max_bins
+        assert np.all(np.abs(one_pass.quantiles(qs) - np.percentile(values, [q * 100 for q in qs]))
+                      <= one_pass.max_error + 1e-12)
+
+
+def off_edges(values, underflow, bin_width):
+    """Drop readings exactly on a bin edge, where np.histogram's float edges may pick the lower bin."""
+    steps = np.round((values - underflow) / bin_width, 6)
+    return values[steps != np.round(steps)]
+
+
+def test_bin_counts_match_array_path():
+    rng = np.random.default_rng(2)
+    engine = GradeSuggestionEngine()
+    volts = np.round(np.concatenate([rng.normal(3.28, 0.015, 3000), [2.5, 3.1, 3.4]]), 4)
+    ir = np.round(np.concatenate([rng.normal(1.85, 0.2, 3000), [0.52, 6.01, 2.53]]), 4)
+    volts = off_edges(volts, engine.voltage_underflow, engine.voltage_bin_width)
+    ir = off_edges(ir, engine.ir_underflow, engine.ir_bin_width)[:len(volts)]
+    volts = volts[:len(ir)]
+
+    hist = StreamingGradeHistogram()
+    for v_part, ir_part in zip(np.array_split(volts, 5), np.array_split(ir, 5)):
+        day = StreamingGradeHistogram()
+        day.add(v_part, ir_part)
+        hist.merge(day)
+
+    assert engine.suggest_ranges_from_bin_counts(*hist.bin_counts(engine)) == \
+        engine.suggest_ranges_equal_width_arrays(volts, ir)
+
+
+def test_bin_counts_put_edge_readings_in_the_upper_bin():
+    engine = GradeSuggestionEngine()
+    hist = StreamingGradeHistogram()
+    hist.add([3.272], [1.8])
+    _, voltage_counts, _ = hist.bin_counts(engine)
+    assert voltage_counts["bins"] == {4: 1}  # [3.272, 3.275)